@@ -1,37 +1,96 @@
+import argparse
 import json
+import os
+import sys
 
-def compress_to_single_line(input_file, output_file):
+from jsonl_index import IndexBuilder, index_path_for
+from quarantine import Quarantine, RecordError, iter_json_records
+
+
+def compress_item(item):
+    # 校验结构并压缩单条记录，结构不符时抛出异常交给调用方隔离
+    if not isinstance(item, dict):
+        raise TypeError("记录不是 JSON 对象")
+    messages = item.get("messages", [])
+    if not isinstance(messages, list):
+        raise TypeError("messages 不是列表")
+
+    compressed_item = {"messages": []}
+    for message in messages:
+        if not isinstance(message, dict):
+            raise TypeError("消息不是 JSON 对象")
+        role = message.get("role", "")
+        content = message.get("content", "")
+        if not isinstance(content, str):
+            raise TypeError("content 不是字符串")
+        content = " ".join(content.split())
+        compressed_item["messages"].append({"role": role, "content": content})
+    return compressed_item
+
+
+def compress_to_single_line(input_file, output_file, on_error="quarantine", quarantine_file=None):
+    """
+    on_error="quarantine"：坏记录写入隔离文件（默认 output_file + ".quarantine.jsonl"）后继续处理；
+    on_error="strict"：遇到第一条坏记录即抛出 RecordError，不改动 output_file。
+    返回 Quarantine，其中包含成功处理的记录数和按错误类型统计的隔离数。
+    """
+    if on_error not in ("quarantine", "strict"):
+        raise ValueError(f"未知的错误处理模式：{on_error}")
+    if quarantine_file is None:
+        quarantine_file = output_file + ".quarantine.jsonl"
+
+    # 先写临时文件，成功后再替换，避免中途停止时留下不完整的输出
+    tmp_file = output_file + ".tmp"
+    index = IndexBuilder()
     try:
-        # 读取输入文件
-        with open(input_file, "r", encoding="utf-8") as infile:
-            data = json.load(infile)
-
-        # 初始化列表存放压缩后的数据
-        compressed_data = []
-
-        for item in data:
-            # 遍历每个项目，将其压缩为一行 JSON 字符串
-            compressed_item = {"messages": []}
-            for message in item.get("messages", []):
-                role = message.get("role", "")
-                content = " ".join(message.get("content", "").split())
-                compressed_item["messages"].append({"role": role, "content": content})
-            compressed_data.append(compressed_item)
-
-        # 将压缩后的数据转为单行字符串
-        with open(output_file, "w", encoding="utf-8") as outfile:
-            for entry in compressed_data:
-                json_line = json.dumps(entry, ensure_ascii=False)
-                outfile.write(json_line + "\n")
-
-        print(f"压缩完成！结果已保存到 {output_file}")
+        with Quarantine(quarantine_file, strict=on_error == "strict") as quarantine, \
+                open(tmp_file, "wb") as outfile:
+            # 逐条读取输入文件，将每个项目压缩为一行 JSON 字符串，同时记录字节偏移量生成索引
+            for offset, item, error in iter_json_records(input_file):
+                if error is not None:
+                    quarantine.add(offset, error, item)
+                    continue
+                try:
+                    entry = compress_item(item)
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    quarantine.add(offset, e, item)
+                    continue
+
+                json_line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+                outfile.write(json_line)
+                index.add(entry, len(json_line))
+                quarantine.processed += 1
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    index.write(index_path_for(output_file), output_file)
+
+    return quarantine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 JSON 对话数据压缩为 JSONL，并生成偏移索引")
+    parser.add_argument("input_file", nargs="?", default="output.json")
+    parser.add_argument("output_file", nargs="?", default="output.jsonl")
+    parser.add_argument("--on-error", choices=("quarantine", "strict"), default="quarantine",
+                        help="quarantine：隔离坏记录后继续；strict：遇到坏记录即停止")
+    parser.add_argument("--quarantine-file", help="隔离文件路径，默认为 <output_file>.quarantine.jsonl")
+    args = parser.parse_args()
+
+    try:
+        quarantine = compress_to_single_line(
+            args.input_file, args.output_file, args.on_error, args.quarantine_file
+        )
+        print(f"压缩完成！结果已保存到 {args.output_file}（索引：{index_path_for(args.output_file)}）")
+        quarantine.print_summary()
 
     except FileNotFoundError:
-        print(f"输入文件 {input_file} 未找到。")
-    except json.JSONDecodeError:
-        print("输入文件不是有效的 JSON 格式。")
+        print(f"输入文件 {args.input_file} 未找到。")
+        sys.exit(1)
+    except RecordError as e:
+        print(f"输入文件包含无效记录：{e}")
+        sys.exit(1)
     except Exception as e:
         print(f"出现错误：{e}")
-
-# 示例调用
-compress_to_single_line("output.json", "output.jsonl")
+        sys.exit(1)
@@ -1,37 +1,106 @@
+import argparse
 import json
+import os
+import sys
+
+from quarantine import Quarantine, RecordError, iter_json_records
+
+
+# The system message shared by every transformed interaction
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "Your role as an assistant involves thoroughly exploring questions through a systematic long thinking process before providing the final precise and accurate solutions. This requires engaging in a comprehensive cycle of analysis, summarizing, exploration, reassessment, reflection, backtracing, and iteration to develop well-considered thinking process. Please structure your response into two main sections: Thought and Solution. In the Thought section, detail your reasoning process using the specified format: <|begin_of_thought|> {thought with steps separated with '\n\n'} <|end_of_thought|> Each step should include detailed considerations such as analisying questions, summarizing relevant findings, brainstorming new ideas, verifying the accuracy of the current steps, refining any errors, and revisiting previous steps. In the Solution section, based on various attempts, explorations, and reflections from the Thought section, systematically present the final solution that you deem correct. The solution should remain a logical, accurate, concise expression style and detail necessary step needed to reach the conclusion, formatted as follows: <|begin_of_solution|> {final formatted, precise, and clear solution} <|end_of_solution|> Now, try to solve the following question through the above guidelines:"
+}
+
+
+def transform_item(item):
+    # Transform a single input record into a list of interactions
+    if not isinstance(item, dict):
+        raise TypeError("record is not a JSON object")
+    conversations = item["conversations"]
+    if not isinstance(conversations, list):
+        raise TypeError("'conversations' is not a list")
+
+    transformed = []
+    # Iterate through conversations and extract the messages
+    for conversation in conversations:
+        if not isinstance(conversation["value"], str):
+            raise TypeError("'value' is not a string")
+        user_message = {
+            "role": "user",
+            "content": conversation["value"]
+        }
+        assistant_message = {
+            "role": "assistant",
+            "content": conversation["value"]
+        }
+
+        # Append system, user, and assistant messages as a single interaction
+        transformed.append({
+            "messages": [
+                SYSTEM_MESSAGE,
+                user_message,
+                assistant_message
+            ]
+        })
+
+    return transformed
 
 
 def transform_data(input_data):
     # Prepare the transformed output
     transformed = []
     for item in input_data:
-        # Extract the system message
-        system_message = {
-            "role": "system",
-            "content": "Your role as an assistant involves thoroughly exploring questions through a systematic long thinking process before providing the final precise and accurate solutions. This requires engaging in a comprehensive cycle of analysis, summarizing, exploration, reassessment, reflection, backtracing, and iteration to develop well-considered thinking process. Please structure your response into two main sections: Thought and Solution. In the Thought section, detail your reasoning process using the specified format: <|begin_of_thought|> {thought with steps separated with '\n\n'} <|end_of_thought|> Each step should include detailed considerations such as analisying questions, summarizing relevant findings, brainstorming new ideas, verifying the accuracy of the current steps, refining any errors, and revisiting previous steps. In the Solution section, based on various attempts, explorations, and reflections from the Thought section, systematically present the final solution that you deem correct. The solution should remain a logical, accurate, concise expression style and detail necessary step needed to reach the conclusion, formatted as follows: <|begin_of_solution|> {final formatted, precise, and clear solution} <|end_of_solution|> Now, try to solve the following question through the above guidelines:"
-        }
+        transformed.extend(transform_item(item))
 
-        # Iterate through conversations and extract the messages
-        for conversation in item["conversations"]:
-            user_message = {
-                "role": "user",
-                "content": conversation["value"]
-            }
-            assistant_message = {
-                "role": "assistant",
-                "content": conversation["value"]
-            }
+    return transformed
 
-            # Append system, user, and assistant messages as a single interaction
-            transformed.append({
-                "messages": [
-                    system_message,
-                    user_message,
-                    assistant_message
-                ]
-            })
 
-    return transformed
+def convert_file(input_file, output_file, on_error="quarantine", quarantine_file=None):
+    """
+    Stream records from a JSON array or JSONL file and write the transformed
+    interactions as a JSON array.
+
+    on_error="quarantine" writes malformed or schema-invalid records to
+    quarantine_file (default: output_file + ".quarantine.jsonl") and keeps going;
+    on_error="strict" raises RecordError on the first bad record and leaves
+    output_file untouched.
+    """
+    if on_error not in ("quarantine", "strict"):
+        raise ValueError(f"unknown error mode: {on_error}")
+    if quarantine_file is None:
+        quarantine_file = output_file + ".quarantine.jsonl"
+
+    # Write to a temporary file first so a failed run never leaves truncated JSON behind
+    tmp_file = output_file + ".tmp"
+    try:
+        with Quarantine(quarantine_file, strict=on_error == "strict") as quarantine, \
+                open(tmp_file, "w", encoding="utf-8") as file:
+            written = 0
+            for offset, item, error in iter_json_records(input_file):
+                if error is not None:
+                    quarantine.add(offset, error, item)
+                    continue
+                try:
+                    interactions = transform_item(item)
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    quarantine.add(offset, e, item)
+                    continue
+
+                # Same layout as json.dump(..., indent=2), written one element at a time
+                for interaction in interactions:
+                    element = json.dumps(interaction, ensure_ascii=False, indent=2)
+                    file.write(("[\n  " if written == 0 else ",\n  ") + element.replace("\n", "\n  "))
+                    written += 1
+                quarantine.processed += 1
+            file.write("\n]" if written else "[]")
+
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    return quarantine
 
 
 # Example Input
@@ -64,28 +133,23 @@ input_data = [
     }
 ]
 
-# File paths
-input_file = "input.json"   # 输入文件名
-output_file = "output.json" # 输出文件名
-
-try:
-        # Read input JSON file
-        with open(input_file, "r", encoding="utf-8") as file:
-            input_data = json.load(file)
-
-        # Transform the data
-        output_data = transform_data(input_data)
-
-        # Write transformed data to output JSON file
-        with open(output_file, "w", encoding="utf-8") as file:
-            json.dump(output_data, file, ensure_ascii=False, indent=2)
-
-except FileNotFoundError:
-        print(f"文件 {input_file} 未找到，请检查文件路径！")
-except json.JSONDecodeError:
-        print("输入文件格式错误，请确保其为有效的 JSON 文件！")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert conversation data to the messages format")
+    parser.add_argument("input_file", nargs="?", default="input.json")    # 输入文件名
+    parser.add_argument("output_file", nargs="?", default="output.json")  # 输出文件名
+    parser.add_argument("--on-error", choices=("quarantine", "strict"), default="quarantine",
+                        help="quarantine: set bad records aside and continue; strict: stop at the first one")
+    parser.add_argument("--quarantine-file", help="defaults to <output_file>.quarantine.jsonl")
+    args = parser.parse_args()
 
+    try:
+        # Stream, transform and write the data; bad records go to the quarantine file
+        quarantine = convert_file(args.input_file, args.output_file, args.on_error, args.quarantine_file)
+        quarantine.print_summary()
 
-# Print the transformed data
-for item in output_data:
-    print(json.dumps(item, ensure_ascii=False, indent=2))
+    except FileNotFoundError:
+        print(f"文件 {args.input_file} 未找到，请检查文件路径！")
+        sys.exit(1)
+    except RecordError as e:
+        print(f"输入文件包含无效记录：{e}")
+        sys.exit(1)
@@ -0,0 +1,305 @@
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+
+# 索引文件格式（小端序）：
+#   头部：魔数(8) + 版本(u32) + 保留(u32) + 记录数(u64) + 源文件字节数(u64) + 源文件 mtime_ns(u64)
+#   starts:        记录数个 u64，第 i 条记录的起始字节偏移量
+#   ends:          记录数个 u64，第 i 条记录占据 [starts[i], ends[i])（含换行符，不含其后的空行）
+#   char_lengths:  记录数个 u64，所有消息 content 的字符数之和
+#   message_counts: 记录数个 u32，每条记录的消息数
+INDEX_MAGIC = b"JSONLIDX"
+INDEX_VERSION = 2
+INDEX_SUFFIX = ".idx"
+_HEADER = struct.Struct("<8sIIQQQ")
+
+
+def index_path_for(jsonl_file):
+    """返回 JSONL 文件对应的索引文件路径"""
+    return jsonl_file + INDEX_SUFFIX
+
+
+def record_stats(record):
+    """统计单条记录的消息数与字符长度"""
+    messages = record.get("messages", []) if isinstance(record, dict) else []
+    if not isinstance(messages, list):
+        messages = []
+    char_length = 0
+    for message in messages:
+        if isinstance(message, dict):
+            content = message.get("content", "")
+            if isinstance(content, str):
+                char_length += len(content)
+    return len(messages), char_length
+
+
+def _to_little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class IndexBuilder:
+    """边写 JSONL 边累积偏移量与统计信息，最后一次性写出索引"""
+
+    def __init__(self, start_offset=0):
+        self.position = start_offset
+        self.starts = array("Q")
+        self.ends = array("Q")
+        self.char_lengths = array("Q")
+        self.message_counts = array("I")
+
+    def __len__(self):
+        return len(self.char_lengths)
+
+    def add(self, record, nbytes):
+        """登记一条记录，nbytes 为其在文件中的字节数（含换行符）"""
+        message_count, char_length = record_stats(record)
+        self.add_stats(nbytes, message_count, char_length)
+
+    def add_stats(self, nbytes, message_count, char_length):
+        self.starts.append(self.position)
+        self.position += nbytes
+        self.ends.append(self.position)
+        self.char_lengths.append(char_length)
+        self.message_counts.append(message_count)
+
+    def skip(self, nbytes):
+        """跳过不属于任何记录的字节（如空行）"""
+        self.position += nbytes
+
+    def write(self, index_file, source_file):
+        # 记录源文件大小与修改时间，用于判断索引是否过期
+        stat = os.stat(source_file)
+        tmp_file = index_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(_HEADER.pack(
+                INDEX_MAGIC, INDEX_VERSION, 0, len(self), stat.st_size, stat.st_mtime_ns
+            ))
+            _to_little_endian(self.starts).tofile(f)
+            _to_little_endian(self.ends).tofile(f)
+            _to_little_endian(self.char_lengths).tofile(f)
+            _to_little_endian(self.message_counts).tofile(f)
+        os.replace(tmp_file, index_file)
+
+
+def build_index(jsonl_file, index_file=None):
+    """
+    对已有的 JSONL 文件单独扫描一遍，生成索引文件。
+    无法解析的行与空行一样不计为记录，并打印其数量和第一处的字节偏移量。
+    """
+    if index_file is None:
+        index_file = index_path_for(jsonl_file)
+
+    builder = IndexBuilder()
+    skipped = 0
+    first_bad_offset = None
+    with open(jsonl_file, "rb") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    if first_bad_offset is None:
+                        first_bad_offset = builder.position
+                    skipped += 1
+                else:
+                    builder.add(record, len(line))
+                    continue
+            # 空行和坏行不算记录，只推进偏移量
+            builder.skip(len(line))
+
+    builder.write(index_file, jsonl_file)
+    if skipped:
+        print(f"{jsonl_file}：跳过 {skipped} 行无法解析的内容（第一处位于偏移量 {first_bad_offset}）")
+    return index_file
+
+
+class JsonlDataset:
+    """
+    基于 mmap 的 JSONL 随机访问读取器：
+    - len() 与下标访问均为 O(1)，只解析被访问的那一行
+    - sample/shuffled/split/filter 返回共享同一 mmap 的视图，不重新读取文件
+    索引缺失或与源文件大小、修改时间不一致时会自动重建。
+    """
+
+    def __init__(self, jsonl_file, index_file=None, rebuild=False):
+        self.jsonl_file = jsonl_file
+        self.index_file = index_file or index_path_for(jsonl_file)
+
+        if rebuild or not self._index_is_fresh():
+            build_index(self.jsonl_file, self.index_file)
+
+        self._data_file = open(self.jsonl_file, "rb")
+        self._index_handle = open(self.index_file, "rb")
+        # 空文件无法 mmap，用空字节串代替
+        self._data = self._map(self._data_file)
+        self._index = self._map(self._index_handle)
+
+        count = _HEADER.unpack_from(self._index, 0)[3]
+        start = _HEADER.size
+        self._starts = self._column(start, "Q", count)
+        start += count * 8
+        self._ends = self._column(start, "Q", count)
+        start += count * 8
+        self._char_lengths = self._column(start, "Q", count)
+        start += count * 8
+        self._message_counts = self._column(start, "I", count)
+
+        # None 表示包含全部记录，否则为所选记录号
+        self._rows = None
+        # 视图共享原数据集的 mmap 与文件句柄，只有原数据集负责关闭
+        self._owner = True
+
+    @staticmethod
+    def _map(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _column(self, start, typecode, count):
+        size = array(typecode).itemsize * count
+        if sys.byteorder == "little":
+            return memoryview(self._index)[start:start + size].cast(typecode)
+        values = array(typecode, self._index[start:start + size])
+        values.byteswap()
+        return values
+
+    def _index_is_fresh(self):
+        if not os.path.exists(self.index_file):
+            return False
+        with open(self.index_file, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return False
+        magic, version, _, _, source_size, source_mtime_ns = _HEADER.unpack(header)
+        stat = os.stat(self.jsonl_file)
+        return (
+            magic == INDEX_MAGIC
+            and version == INDEX_VERSION
+            and source_size == stat.st_size
+            and source_mtime_ns == stat.st_mtime_ns
+        )
+
+    def close(self):
+        if not self._owner:
+            return
+        for column in (self._starts, self._ends, self._char_lengths, self._message_counts):
+            if isinstance(column, memoryview):
+                column.release()
+        for mapped in (self._data, self._index):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._data_file.close()
+        self._index_handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _view(self, rows):
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view._rows = rows
+        view._owner = False
+        return view
+
+    def _row(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("JsonlDataset index out of range")
+        return i if self._rows is None else self._rows[i]
+
+    def __len__(self):
+        return len(self._char_lengths) if self._rows is None else len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._view(array("Q", (self._row(j) for j in range(*i.indices(len(self))))))
+        return json.loads(self.raw(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def raw(self, i):
+        """返回第 i 条记录的原始字节（不解析）"""
+        row = self._row(i)
+        return self._data[self._starts[row]:self._ends[row]]
+
+    def char_length(self, i):
+        return self._char_lengths[self._row(i)]
+
+    def message_count(self, i):
+        return self._message_counts[self._row(i)]
+
+    def _all_rows(self):
+        return range(len(self._char_lengths)) if self._rows is None else self._rows
+
+    def shuffled(self, seed=None):
+        rows = array("Q", self._all_rows())
+        random.Random(seed).shuffle(rows)
+        return self._view(rows)
+
+    def sample(self, k, seed=None):
+        """按种子无放回抽取 k 条记录，返回视图"""
+        rows = random.Random(seed).sample(self._all_rows(), k)
+        return self._view(array("Q", rows))
+
+    def split(self, val_ratio=0.1, seed=None):
+        """打乱后按比例切分为 (train, validation) 两个视图"""
+        rows = self.shuffled(seed)._rows
+        n_val = int(round(len(rows) * val_ratio))
+        return self._view(rows[n_val:]), self._view(rows[:n_val])
+
+    def filter(self, min_chars=None, max_chars=None, min_messages=None, max_messages=None):
+        """只依据索引中的统计信息过滤，不解析记录内容"""
+        char_lengths = self._char_lengths
+        message_counts = self._message_counts
+        rows = array("Q")
+        for row in self._all_rows():
+            chars = char_lengths[row]
+            messages = message_counts[row]
+            if min_chars is not None and chars < min_chars:
+                continue
+            if max_chars is not None and chars > max_chars:
+                continue
+            if min_messages is not None and messages < min_messages:
+                continue
+            if max_messages is not None and messages > max_messages:
+                continue
+            rows.append(row)
+        return self._view(rows)
+
+    def write_jsonl(self, output_file):
+        """把当前视图按原始字节写成新的 JSONL 文件，并同时生成其索引"""
+        builder = IndexBuilder()
+        with open(output_file, "wb") as outfile:
+            for i in range(len(self)):
+                row = self._row(i)
+                line = self.raw(i)
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                outfile.write(line)
+                builder.add_stats(len(line), self._message_counts[row], self._char_lengths[row])
+        builder.write(index_path_for(output_file), output_file)
+        return output_file
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法：python jsonl_index.py data.jsonl [data.jsonl ...]")
+        sys.exit(1)
+    for path in sys.argv[1:]:
+        index_file = build_index(path)
+        with JsonlDataset(path, index_file) as dataset:
+            print(f"{path}：{len(dataset)} 条记录，索引已保存到 {index_file}")
@@ -0,0 +1,344 @@
+import codecs
+from bisect import bisect_left
+import json
+import os
+import re
+from collections import Counter
+
+# 错误类型
+JSON_DECODE = "json_decode"
+MISSING_KEY = "missing_key"
+INVALID_TYPE = "invalid_type"
+INVALID_VALUE = "invalid_value"
+ENCODING = "encoding"
+TRUNCATED = "truncated"
+
+# JSON 数组输入每次读取的字节数
+CHUNK_SIZE = 1 << 20
+
+_STRUCTURAL = re.compile(r'["\[\]{},]')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_WHITESPACE = re.compile(r"\s*")
+# 以 surrogateescape 解码后，无法解码的字节表现为 U+DC80..U+DCFF
+_UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+
+class RecordError(ValueError):
+    """单条记录无法处理；严格模式下由 Quarantine 抛出"""
+
+    def __init__(self, reason, offset, message):
+        super().__init__(f"偏移量 {offset} 处的记录无效（{reason}）：{message}")
+        self.reason = reason
+        self.offset = offset
+        self.message = message
+
+
+class TruncatedInputError(ValueError):
+    """输入在数组结束之前就已结束"""
+
+
+def classify(exc):
+    """把处理记录时抛出的异常归类为错误类型"""
+    if isinstance(exc, RecordError):
+        return exc.reason
+    if isinstance(exc, UnicodeError):
+        return ENCODING
+    if isinstance(exc, TruncatedInputError):
+        return TRUNCATED
+    if isinstance(exc, json.JSONDecodeError):
+        return JSON_DECODE
+    if isinstance(exc, KeyError):
+        return MISSING_KEY
+    if isinstance(exc, (TypeError, AttributeError)):
+        return INVALID_TYPE
+    return INVALID_VALUE
+
+
+def _skip_value(text, pos):
+    """
+    从 pos 开始跳过一个（可能格式错误的）数组元素，
+    返回同层的下一个逗号或数组结尾 ']' 的位置，找不到则返回文本末尾。
+    """
+    depth = 0
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            return len(text)
+        pos = match.start()
+        char = text[pos]
+        if char == '"':
+            string = _STRING.match(text, pos)
+            if string is None:
+                return len(text)
+            pos = string.end()
+            continue
+        if char in "[{":
+            depth += 1
+        elif char in "]}":
+            if depth == 0:
+                if char == "]":
+                    return pos
+            else:
+                depth -= 1
+        elif depth == 0:
+            return pos
+        pos += 1
+
+
+def _encode(text):
+    return text.encode("utf-8", errors="surrogateescape")
+
+
+def _readable(raw):
+    # 隔离文件以 UTF-8 写出，无法解码的字节替换为 U+FFFD
+    return _encode(raw).decode("utf-8", errors="replace")
+
+
+class _TextStream:
+    """
+    按块读取并增量解码输入文件，维护一个滑动文本缓冲区。
+    缓冲区中的位置都是相对 self.text 的字符下标；drop() 丢弃已处理的前缀，
+    to_bytes() 把字符下标换算为文件中的字节偏移量。
+    """
+
+    def __init__(self, infile, base_offset=0):
+        self.infile = infile
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="surrogateescape")
+        self.text = ""
+        self.eof = False
+        self.base_char = 0           # self.text[0] 在整个输入中的字符下标
+        self.mark_char = 0           # 最近一次换算过的字符下标及其字节偏移量
+        self.mark_byte = base_offset
+        self.undecodable = []        # 无法解码的字节所在的字符下标（全局）
+
+    def fill(self):
+        # 每次至少读取一块；缓冲区很大时按其大小读取，保证超大元素也是线性时间
+        data = self.infile.read(max(CHUNK_SIZE, len(self.text)))
+        if not data:
+            self.eof = True
+        chunk = self.decoder.decode(data, final=self.eof)
+        if not chunk.isascii():
+            try:
+                chunk.encode("utf-8")
+            except UnicodeEncodeError:
+                offset = self.base_char + len(self.text)
+                self.undecodable.extend(
+                    offset + match.start() for match in _UNDECODABLE.finditer(chunk)
+                )
+        self.text += chunk
+
+    def skip_whitespace(self, pos):
+        while True:
+            pos = _WHITESPACE.match(self.text, pos).end()
+            if pos < len(self.text) or self.eof:
+                return pos
+            self.fill()
+
+    def drop(self, pos):
+        self.to_bytes(pos)
+        self.text = self.text[pos:]
+        self.base_char += pos
+
+    def to_bytes(self, pos):
+        absolute = self.base_char + pos
+        self.mark_byte += len(_encode(self.text[self.mark_char - self.base_char:pos]))
+        self.mark_char = absolute
+        return self.mark_byte
+
+    def encoding_error(self, start, end):
+        # [start, end) 中含有无法解码的字节时返回对应的 UnicodeDecodeError
+        if not self.undecodable:
+            return None
+        i = bisect_left(self.undecodable, self.base_char + start)
+        if i == len(self.undecodable) or self.undecodable[i] >= self.base_char + end:
+            return None
+        bad = len(_encode(self.text[start:self.undecodable[i] - self.base_char]))
+        return UnicodeDecodeError(
+            "utf-8", _encode(self.text[start:end]), bad, bad + 1, "invalid utf-8 byte"
+        )
+
+    def extent(self, start, in_array):
+        """
+        坏内容的范围：数组内跳到同层的下一个逗号或 ']'，数组外跳到行尾。
+        """
+        while True:
+            if not in_array:
+                end = self.text.find("\n", start)
+                end = len(self.text) if end == -1 else end
+            elif self.text[start] == ",":
+                # 空元素（如 "[1,,2]"）停在逗号上
+                end = start
+            else:
+                end = _skip_value(self.text, start)
+            if end < len(self.text) or self.eof:
+                return end
+            self.fill()
+
+    def decode(self, decoder, start, in_array):
+        """解析从 start 开始的一个值，返回 (记录或原始文本, 结束位置, 错误)"""
+        while True:
+            text = self.text
+            try:
+                record, end = decoder.raw_decode(text, start)
+            except json.JSONDecodeError as e:
+                # 被块边界截断时，出错位置之后不会再有换行或同层分隔符
+                if (
+                    self.eof
+                    or text.find("\n", e.pos) != -1
+                    or (in_array and _skip_value(text, start) < len(text))
+                ):
+                    end = self.extent(start, in_array)
+                    error = json.JSONDecodeError(e.msg, self.text[start:end], e.pos - start)
+                    break
+            else:
+                # 值恰好结束在缓冲区末尾（如被截断的数字）时读入更多再确认
+                if end < len(text) or self.eof:
+                    error = None
+                    break
+            self.fill()
+
+        bad_bytes = self.encoding_error(start, end)
+        if bad_bytes is not None:
+            return _readable(self.text[start:end]), end, bad_bytes
+        if error is not None:
+            return self.text[start:end], end, error
+        return record, end, None
+
+
+def _iter_json_stream(infile, base_offset=0):
+    """
+    流式解析以 '[' 开头的输入。数组关闭后的内容继续解析：
+    后续的数组按同样方式逐个元素读取，数组外的值按单条记录处理，
+    无法解析的内容按行隔离；数组缺少结尾的 ']' 时报告 truncated。
+    """
+    stream = _TextStream(infile, base_offset)
+    decoder = json.JSONDecoder()
+    in_array = False
+    pos = 0
+    while True:
+        pos = stream.skip_whitespace(pos)
+        if pos >= len(stream.text):
+            if in_array:
+                yield stream.to_bytes(pos), "", TruncatedInputError(
+                    "数组缺少结尾的 ']'，文件可能被截断"
+                )
+            return
+
+        char = stream.text[pos]
+        if char == "[" and not in_array:
+            in_array = True
+            pos += 1
+            continue
+        if char == "]" and in_array:
+            in_array = False
+            pos += 1
+            continue
+
+        if pos > CHUNK_SIZE:
+            stream.drop(pos)
+            pos = 0
+        start = pos
+        record, pos, error = stream.decode(decoder, start, in_array)
+        yield stream.to_bytes(start), record, error
+        if not in_array:
+            continue
+
+        pos = stream.skip_whitespace(pos)
+        if pos >= len(stream.text) or stream.text[pos] == "]":
+            continue
+        if stream.text[pos] == ",":
+            pos += 1
+            continue
+
+        # 元素之后出现了多余内容，跳到下一个逗号继续
+        start = pos
+        pos = stream.extent(start, in_array)
+        error = stream.encoding_error(start, pos) or json.JSONDecodeError(
+            "Expecting ',' delimiter", stream.text[start:pos], 0
+        )
+        yield stream.to_bytes(start), _readable(stream.text[start:pos]), error
+        if pos < len(stream.text) and stream.text[pos] == ",":
+            pos += 1
+
+
+def _iter_jsonl(infile):
+    offset = 0
+    for line in infile:
+        if line.strip():
+            try:
+                yield offset, json.loads(line), None
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                yield offset, line.decode("utf-8", errors="replace").rstrip("\r\n"), e
+        offset += len(line)
+
+
+def iter_json_records(input_file):
+    """
+    逐条流式读取 JSON 数组或 JSONL 文件，产出 (字节偏移量, 记录, 错误)。
+    解析失败时记录为原始文本、错误为对应异常，之后继续读取下一条。
+    内存占用与单条记录的大小相关，而不是与整个文件相关。
+    """
+    with open(input_file, "rb") as infile:
+        head = infile.read(4096)
+        infile.seek(0)
+        bom = len(codecs.BOM_UTF8) if head.startswith(codecs.BOM_UTF8) else 0
+        if not head[bom:].lstrip().startswith(b"["):
+            yield from _iter_jsonl(infile)
+            return
+        infile.seek(bom)
+        yield from _iter_json_stream(infile, bom)
+
+
+class Quarantine:
+    """
+    收集无法处理的记录：每条写入隔离文件（JSONL，含字节偏移量、错误类型和原始内容），
+    并按错误类型计数。strict=True 时遇到第一条坏记录即抛出 RecordError。
+    """
+
+    def __init__(self, quarantine_file, strict=False):
+        self.quarantine_file = quarantine_file
+        self.strict = strict
+        self.counts = Counter()
+        self.processed = 0
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        # 本次运行成功且没有坏记录时，清掉上一次留下的隔离文件；
+        # 运行失败时保留，避免丢失上一次的报告
+        if exc_type is None and not self.total and os.path.exists(self.quarantine_file):
+            os.remove(self.quarantine_file)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def add(self, offset, exc, raw):
+        reason = classify(exc)
+        message = str(exc)
+        if self.strict:
+            raise RecordError(reason, offset, message) from exc
+
+        if self._file is None:
+            # 出现第一条坏记录时才创建（或覆盖）隔离文件
+            self._file = open(self.quarantine_file, "w", encoding="utf-8")
+        if not isinstance(raw, str):
+            raw = json.dumps(raw, ensure_ascii=False)
+        entry = {"offset": offset, "reason": reason, "error": message, "raw": raw}
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.counts[reason] += 1
+
+    def print_summary(self):
+        print(f"成功处理 {self.processed} 条记录，隔离 {self.total} 条记录。")
+        for reason, count in self.counts.most_common():
+            print(f"  {reason}: {count}")
+        if self.total:
+            print(f"坏记录已保存到 {self.quarantine_file}")